@@ -1,62 +1,23 @@
 import streamlit as st
 import pandas as pd
-import json
+import numpy as np
 import plotly.graph_objects as go
 import os
 
-# Function to load data
-@st.cache_data
-def load_data(file_path):
-    """Loads CSV data from the given file path."""
-    try:
-        df = pd.read_csv(file_path)
-        return df
-    except FileNotFoundError:
-        st.error(f"Error: File not found at {file_path}")
-        return pd.DataFrame()
-
-# Function to load JSON mappings
-@st.cache_data
-def load_json_mapping(file_path):
-    """Loads JSON data from the given file path."""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except FileNotFoundError:
-        st.error(f"Error: Mapping file not found at {file_path}")
-        return {}
-
-# Load mapping files
-member_mapping = load_json_mapping('member_mapping.json')
-sector_mapping = load_json_mapping('sector_mapping.json')
-stock_mapping = load_json_mapping('stock_mapping.json')
-titles_mapping = load_json_mapping('titles.json')
-
-# Default portfolio file path
-DEFAULT_PORTFOLIO_FILE = 'portfolioinputs.csv' # [cite: 21]
-
-def get_text(key, lang):
-    """Retrieves localized text from the titles mapping."""
-    return titles_mapping.get(key, {}).get(lang, key)
-
-def format_currency(value):
-    """Formats a number as Indian Rupees."""
-    return f"₹ {value:,.2f}"
-
-def get_member_name(member_code, lang):
-    """Retrieves localized member name."""
-    return member_mapping.get(member_code, {}).get(lang, member_code)
-
-def get_sector_name(sector_name_en, lang):
-    """Retrieves localized sector name based on English name."""
-    for key, value in sector_mapping.items():
-        if value['en'] == sector_name_en:
-            return value.get(lang, sector_name_en)
-    return sector_name_en
-
-def get_stock_name(isin_code, lang):
-    """Retrieves localized stock name."""
-    return stock_mapping.get(isin_code, {}).get(lang, isin_code)
+from portfolio_core import (
+    DEFAULT_PORTFOLIO_FILE,
+    PIE_VALUE_LABEL_LIMIT,
+    bucket_allocation,
+    calculate_hpr,
+    format_currency,
+    format_quantity,
+    get_filter_options,
+    get_stock_name,
+    get_text,
+    highlight_hpr_num,
+    load_default_portfolio,
+    load_uploaded_portfolio,
+)
 
 st.set_page_config(layout="wide")
 
@@ -72,62 +33,52 @@ st.title(get_text("Portfolio Summary", lang)) # [cite: 15, 16]
 # File uploader 
 uploaded_file = st.sidebar.file_uploader(get_text("Upload Portfolio CSV", lang), type="csv") # 
 
+# Loaded with display mappings and HPR applied, cached per source and language
 df = pd.DataFrame()
 if uploaded_file is not None:
-    df = load_data(uploaded_file)
+    df = load_uploaded_portfolio(uploaded_file, uploaded_file.file_id, lang)
 else:
     if os.path.exists(DEFAULT_PORTFOLIO_FILE):
-        df = load_data(DEFAULT_PORTFOLIO_FILE)
+        df = load_default_portfolio(DEFAULT_PORTFOLIO_FILE, os.path.getmtime(DEFAULT_PORTFOLIO_FILE), lang)
     else:
         st.info("Please upload a portfolio CSV file.")
 
 if not df.empty:
-    # Data Cleaning and Type Conversion (if necessary)
-    df['Value At Cost'] = pd.to_numeric(df['Value At Cost'], errors='coerce')
-    df['Value At Market Price'] = pd.to_numeric(df['Value At Market Price'], errors='coerce')
-    df['Qty'] = pd.to_numeric(df['Qty'], errors='coerce')
-
-    # Apply mappings for display
-    df['Member Name'] = df['Member Code'].apply(lambda x: get_member_name(x, lang)) # [cite: 6, 7, 8, 19]
-    df['Stock Display Name'] = df['ISIN Code'].apply(lambda x: get_stock_name(x, lang)) # [cite: 12, 13, 14]
-    df['Sector Display Name'] = df['Sector Name'].apply(lambda x: get_sector_name(x, lang)) # [cite: 9, 10, 11]
-
-    # Calculate HPR 
-    # Handle potential division by zero
-    df['HPR'] = ((df['Value At Market Price'] - df['Value At Cost']) / df['Value At Cost'] * 100).round(2) # [cite: 7, 10]
-    df['HPR'] = df['HPR'].fillna(0) # Replace NaN with 0 for display purposes
-
     # Filters 
-    all_portfolios = ['All'] + df['Portfolio'].unique().tolist()
+    all_portfolios = get_filter_options(tuple(df['Portfolio'].cat.categories))
     selected_portfolio = st.sidebar.selectbox(get_text("Select Portfolio", lang), all_portfolios) # [cite: 20]
 
-    all_members = ['All'] + df['Member Name'].unique().tolist()
+    all_members = get_filter_options(tuple(df['Member Name'].cat.categories))
     selected_member = st.sidebar.selectbox(get_text("Select Member", lang), all_members) # 
 
-    all_sectors = ['All'] + df['Sector Display Name'].unique().tolist()
+    all_sectors = get_filter_options(tuple(df['Sector Display Name'].cat.categories))
     selected_sector = st.sidebar.selectbox(get_text("Select Sector", lang), all_sectors) # 
 
-    all_brokers = ['All'] + df['Broker'].unique().tolist()
+    all_brokers = get_filter_options(tuple(df['Broker'].cat.categories))
     selected_broker = st.sidebar.selectbox(get_text("Select Broker", lang), all_brokers) # 
 
-    # Apply filters
-    filtered_df = df.copy()
-    if selected_portfolio != 'All':
-        filtered_df = filtered_df[filtered_df['Portfolio'] == selected_portfolio]
-    if selected_member != 'All':
-        filtered_df = filtered_df[filtered_df['Member Name'] == selected_member]
-    if selected_sector != 'All':
-        filtered_df = filtered_df[filtered_df['Sector Display Name'] == selected_sector]
-    if selected_broker != 'All':
-        filtered_df = filtered_df[filtered_df['Broker'] == selected_broker]
+    # Apply filters as a single combined mask; with no filter the frame is used as-is
+    any_filter = (selected_portfolio, selected_member, selected_sector, selected_broker) != ('All', 'All', 'All', 'All')
+    filtered_df = df
+    if any_filter:
+        mask = np.ones(len(df), dtype=bool)
+        if selected_portfolio != 'All':
+            mask &= (df['Portfolio'] == selected_portfolio).to_numpy()
+        if selected_member != 'All':
+            mask &= (df['Member Name'] == selected_member).to_numpy()
+        if selected_sector != 'All':
+            mask &= (df['Sector Display Name'] == selected_sector).to_numpy()
+        if selected_broker != 'All':
+            mask &= (df['Broker'] == selected_broker).to_numpy()
+        filtered_df = df.loc[mask]
 
     if filtered_df.empty:
         st.warning("No data available for the selected filters.")
     else:
         # 3A. Total Summary (one liner) 
-        total_investment = filtered_df['Value At Cost'].sum() # 
-        total_current_value = filtered_df['Value At Market Price'].sum() # 
-        total_hpr = ((total_current_value - total_investment) / total_investment * 100).round(2) if total_investment != 0 else 0 # 
+        totals = np.nansum(filtered_df[['Value At Cost', 'Value At Market Price']].to_numpy(dtype='float64', na_value=np.nan), axis=0) #
+        total_investment, total_current_value = float(totals[0]), float(totals[1])
+        total_hpr = round((total_current_value - total_investment) / total_investment * 100, 2) if total_investment != 0 else 0 # 
 
         st.subheader(get_text("Portfolio Summary", lang)) # 
         st.write(f"**{get_text('Investment', lang)}:** {format_currency(total_investment)} | " # 
@@ -146,28 +97,21 @@ if not df.empty:
         summarize_by_selection = st.radio(get_text("Summarize By", lang), options=list(summarize_by_options.keys()), index=0, horizontal=True) # 
         group_by_column = summarize_by_options[summarize_by_selection]
 
-        summary_table = filtered_df.groupby(group_by_column).agg( # 
-            Investment=('Value At Cost', 'sum'), # 
-            Current_Value=('Value At Market Price', 'sum') # 
-        ).reset_index()
-
-        summary_table['HPR'] = ((summary_table['Current_Value'] - summary_table['Investment']) / summary_table['Investment'] * 100).round(2) # 
-        summary_table['HPR'] = summary_table['HPR'].fillna(0) # Handle division by zero for HPR
-
-        # Apply formatting
-        summary_table['Investment'] = summary_table['Investment'].apply(format_currency) # 
-        summary_table['Current_Value'] = summary_table['Current_Value'].apply(format_currency) # 
-        summary_table['HPR'] = summary_table['HPR'].apply(lambda x: f"{x:.2f}%") # 
+        summary_table = (
+            filtered_df[[group_by_column, 'Value At Cost', 'Value At Market Price']]
+            .groupby(group_by_column, observed=True, sort=False)
+            .sum()
+            .rename(columns={'Value At Cost': 'Investment', 'Value At Market Price': 'Current_Value'})
+            .reset_index()
+        )
 
-        # Conditional formatting for HPR 
-        def highlight_hpr(s):
-            if isinstance(s, str) and '%' in s:
-                value = float(s.replace('%', ''))
-                return ['background-color: #ffe6e6' if value < 0 else '' for _ in s] # Light red for negative returns
-            return ['' for _ in s]
+        summary_table['HPR'] = calculate_hpr(summary_table['Investment'], summary_table['Current_Value']) # 
 
+        # Values stay numeric; formatting is applied by the styler at render time
         st.dataframe(
-            summary_table.style.apply(highlight_hpr, subset=['HPR']),
+            summary_table.style
+                .format({'Investment': format_currency, 'Current_Value': format_currency, 'HPR': '{:.2f}%'.format})
+                .apply(highlight_hpr_num, subset=['HPR']),
          #   hide_row_index=True,
             column_config={
                 group_by_column: st.column_config.TextColumn(group_by_column),
@@ -186,13 +130,15 @@ if not df.empty:
         )
         allocation_column = summarize_by_options[allocation_by]
 
-        allocation_data = filtered_df.groupby(allocation_column)['Value At Cost'].sum().reset_index()
+        allocation_data = filtered_df['Value At Cost'].groupby(filtered_df[allocation_column], observed=True).sum()
+        labels, values = bucket_allocation(allocation_data, get_text('Other', lang))
+        show_values = len(values) <= PIE_VALUE_LABEL_LIMIT
         fig = go.Figure(data=[go.Pie(
-            labels=allocation_data[allocation_column],
-            values=allocation_data['Value At Cost'],
+            labels=labels,
+            values=values,
             hoverinfo='label+percent',
-            textinfo='value',
-            texttemplate='%{value:,.2f}',
+            textinfo='value' if show_values else 'percent',
+            texttemplate='%{value:,.2f}' if show_values else '%{percent}',
             marker=dict(line=dict(color='#000000', width=1))
         )])
         fig.update_layout(showlegend=True, title_text=f"{get_text('Investment Allocation', lang)} ({get_text(allocation_by, lang)})")
@@ -213,26 +159,29 @@ if not df.empty:
             'HPR' # 
         ]].copy()
 
-        # Apply currency formatting
-        display_df['Value At Cost'] = display_df['Value At Cost'].apply(format_currency) # 
-        display_df['Value At Market Price'] = display_df['Value At Market Price'].apply(format_currency) # 
-        display_df['HPR'] = display_df['HPR'].apply(lambda x: f"{x:.2f}%") # 
-
         # Rename columns for display in selected language
+        quantity_label = get_text('Quantity', lang) if lang == 'en' else 'அளவு' # Example, add to titles.json for proper localization
         display_df.rename(columns={
             'Member Name': get_text('Select Member', lang),
             'Broker': get_text('Select Broker', lang),
             'Sector Display Name': get_text('Select Sector', lang),
             'Stock Display Name': get_text('Stock Name', lang) if lang == 'en' else get_stock_name('ISIN Code', lang), # Fallback if specific stock name not in titles.json
-            'Qty': get_text('Quantity', lang) if lang == 'en' else 'அளவு', # Example, add to titles.json for proper localization
+            'Qty': quantity_label,
             'Value At Cost': get_text('Investment', lang),
             'Value At Market Price': get_text('Current Value', lang),
             'HPR': get_text('HPR', lang)
         }, inplace=True)
 
-        # Conditional formatting for negative HPR in detailed table 
+        # Currency formatting and conditional formatting for negative HPR in detailed table 
         st.dataframe(
-            display_df.style.apply(highlight_hpr, subset=[get_text('HPR', lang)]),
+            display_df.style
+                .format({
+                    get_text('Investment', lang): format_currency,
+                    get_text('Current Value', lang): format_currency,
+                    get_text('HPR', lang): '{:.2f}%'.format,
+                    quantity_label: format_quantity
+                })
+                .apply(highlight_hpr_num, subset=[get_text('HPR', lang)]),
            # hide_row_index=True,
             column_config={
                 get_text('Investment', lang): st.column_config.Column(
@@ -0,0 +1,270 @@
+"""
+Shared data loading, localization and formatting helpers for the portfolio dashboards.
+Both app.py and Dashboard-Summary-canvas.py import from here, so the Streamlit caches
+and the mapping dictionaries are held once per process instead of once per script.
+"""
+import streamlit as st
+import pandas as pd
+import numpy as np
+import json
+from functools import lru_cache
+
+# Column types for the portfolio CSV, applied by the reader itself so numeric
+# parsing happens once and text columns are stored as Arrow strings.
+# Numeric columns stay float64: float32 cannot hold paise exactly above ~131,072, its sums drift
+# visibly in the summary table, and fractional fund/ETF units would display with float32 noise.
+PORTFOLIO_DTYPES = {
+    'Value At Cost': 'float64',
+    'Value At Market Price': 'float64',
+    'Qty': 'float64',
+    'Portfolio': 'string[pyarrow]',
+    'Broker': 'string[pyarrow]',
+    'Member Code': 'string[pyarrow]',
+    'ISIN Code': 'string[pyarrow]',
+    'Sector Name': 'string[pyarrow]',
+}
+NUMERIC_COLUMNS = ('Value At Cost', 'Value At Market Price', 'Qty')
+
+# Prepared portfolios are cached per (source, language); bound the cache so
+# repeated uploads do not grow it without limit
+PORTFOLIO_CACHE_ENTRIES = 8
+
+# Function to load data
+def read_portfolio_csv(file_path):
+    """
+    Loads CSV data from the given file path or file-like object.
+    Parses with the PyArrow engine using PORTFOLIO_DTYPES, so no separate type conversion pass is needed.
+    If a numeric column holds a non-numeric cell (e.g. '-' from a broker export), the file is re-read
+    with those columns as text and the bad cells are coerced to NaN, as before.
+    """
+    try:
+        df = pd.read_csv(
+            file_path,
+            engine='pyarrow',
+            dtype_backend='pyarrow',
+            dtype=PORTFOLIO_DTYPES
+        )
+        return df
+    except FileNotFoundError:
+        st.error(f"Error: File not found at {file_path}")
+        return pd.DataFrame()
+    except ValueError:
+        # pyarrow.ArrowInvalid is a ValueError; fall through to the lenient parse below
+        pass
+
+    if hasattr(file_path, 'seek'):
+        file_path.seek(0)
+    text_dtypes = {**PORTFOLIO_DTYPES, **{col: 'string[pyarrow]' for col in NUMERIC_COLUMNS}}
+    df = pd.read_csv(file_path, engine='pyarrow', dtype_backend='pyarrow', dtype=text_dtypes)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype(PORTFOLIO_DTYPES[col])
+    return df
+
+@st.cache_data(persist="disk")
+def load_default_csv(file_path, modified_time):
+    """
+    Loads the default portfolio CSV, persisting the parsed DataFrame to Streamlit's disk cache
+    so later app launches skip CSV parsing.
+    modified_time is only part of the cache key, so editing the file invalidates the cached copy.
+    """
+    return read_portfolio_csv(file_path)
+
+# Function to load JSON mappings
+@st.cache_resource
+def load_json_mapping(file_path):
+    """
+    Loads JSON data from the given file path.
+    Uses st.cache_resource so the read-only mapping is shared by reference instead of copied on every rerun.
+    """
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        st.error(f"Error: Mapping file not found at {file_path}")
+        return {}
+
+# Load mapping files
+# These mappings are used for multilingual support and displaying user-friendly names.
+member_mapping = load_json_mapping('member_mapping.json')
+sector_mapping = load_json_mapping('sector_mapping.json')
+stock_mapping = load_json_mapping('stock_mapping.json')
+titles_mapping = load_json_mapping('titles.json')
+
+# Default portfolio file path
+# This file will be loaded if no other file is uploaded by the user.
+DEFAULT_PORTFOLIO_FILE = 'portfolioinputs.csv'
+
+# Pie chart limits: slices beyond MAX_PIE_SLICES are bucketed into "Other", and per-slice
+# value labels are only drawn up to PIE_VALUE_LABEL_LIMIT slices (percentages beyond that)
+MAX_PIE_SLICES = 12
+PIE_VALUE_LABEL_LIMIT = 8
+
+@lru_cache(maxsize=None)
+def build_texts(lang):
+    """
+    Builds a flat key -> localized text dictionary for the given language.
+    Memoized with lru_cache rather than st.cache_data: get_text is called dozens of times
+    per rerun, and st.cache_data would hash the argument and copy the dictionary on every call.
+    """
+    return {key: value.get(lang, key) for key, value in titles_mapping.items()}
+
+def get_text(key, lang):
+    """
+    Retrieves localized text from the titles mapping JSON.
+    If the key or language is not found, it defaults to the key itself.
+    """
+    return build_texts(lang).get(key, key)
+
+def format_currency(value):
+    """
+    Formats a numeric value as Indian Rupees with two decimal places and commas.
+    """
+    return f"₹ {value:,.2f}"
+
+def format_quantity(value):
+    """
+    Formats a quantity without trailing zeros: whole shares show as 20, fractional units as 1,234.567.
+    """
+    return f"{value:,.3f}".rstrip('0').rstrip('.')
+
+def bucket_allocation(allocation, other_label, max_slices=MAX_PIE_SLICES):
+    """
+    Returns (labels, values) arrays for a pie chart from an aggregated allocation Series,
+    largest first. When there are more than max_slices groups, the smallest ones are summed
+    into a single slice named other_label so the chart stays bounded in size.
+    """
+    allocation = allocation.sort_values(ascending=False)
+    labels = allocation.index.to_numpy(dtype=object)
+    values = allocation.to_numpy()
+    if len(values) > max_slices:
+        labels = np.append(labels[:max_slices - 1], other_label)
+        values = np.append(values[:max_slices - 1], values[max_slices - 1:].sum())
+    return labels, values
+
+def highlight_hpr_num(col):
+    """
+    Styler function that shades negative HPR values light red.
+    Returns an array of CSS strings from one vectorized comparison over the numeric column.
+    """
+    return np.where(col.to_numpy() < 0, 'background-color: #ffe6e6', '')
+
+def calculate_hpr(cost, market_value):
+    """
+    Calculates Holding Period Return (%) element-wise, rounded to two decimals.
+    Rows with zero or missing cost get an HPR of 0 instead of inf/NaN, in a single vectorized pass.
+    """
+    cost = np.asarray(cost, dtype='float64')
+    market_value = np.asarray(market_value, dtype='float64')
+    valid = (cost != 0) & np.isfinite(cost) & np.isfinite(market_value)
+    hpr = np.where(valid, (market_value - cost) / np.where(valid, cost, 1.0) * 100.0, 0.0)
+    return np.round(hpr, 2)
+
+def map_categorical(values, lookup):
+    """
+    Maps a column through a lookup dictionary, returning a categorical Series.
+    The lookup runs once per distinct value (the categories); rows are then
+    remapped with a single integer gather on the category codes.
+    Values missing from the lookup are kept as-is.
+    """
+    source = values.astype('category')
+    codes = source.cat.codes.to_numpy()
+    # Localized names may collide, so factorize them into a unique category set
+    remap, categories = pd.factorize(source.cat.categories.map(lambda v: lookup.get(v, v)))
+    # Only gather present codes: missing values (-1) stay missing, even when there are no categories
+    out = np.full_like(codes, -1)
+    present = codes >= 0
+    out[present] = remap[codes[present]]
+    return pd.Series(pd.Categorical.from_codes(out, categories), index=values.index)
+
+def get_member_name(member_code, lang):
+    """
+    Retrieves the localized member name from the member_mapping.
+    """
+    return member_mapping.get(member_code, {}).get(lang, member_code)
+
+def get_sector_name(sector_name_en, lang):
+    """
+    Retrieves the localized sector name from the sector_mapping.
+    Uses the memoized English -> localized lookup instead of scanning the mapping.
+    Intended for single-value callers; bulk column mapping uses build_sector_lookup directly.
+    """
+    return build_sector_lookup(lang).get(sector_name_en, sector_name_en)
+
+def get_stock_name(isin_code, lang):
+    """
+    Retrieves the localized stock name from the stock_mapping using ISIN code.
+    """
+    return stock_mapping.get(isin_code, {}).get(lang, isin_code)
+
+@lru_cache(maxsize=None)
+def build_member_lookup(lang):
+    """
+    Builds a flat member code -> localized name dictionary for the given language.
+    Memoized with lru_cache like build_texts, so single-value lookups such as
+    get_sector_name get the shared dictionary without st.cache_data's hash-and-copy cost.
+    """
+    return {code: value.get(lang, code) for code, value in member_mapping.items()}
+
+@lru_cache(maxsize=None)
+def build_stock_lookup(lang):
+    """
+    Builds a flat ISIN code -> localized stock name dictionary for the given language.
+    """
+    return {isin: value.get(lang, isin) for isin, value in stock_mapping.items()}
+
+@lru_cache(maxsize=None)
+def build_sector_lookup(lang):
+    """
+    Builds a flat English sector name -> localized sector name dictionary for the given language.
+    """
+    return {value['en']: value.get(lang, value['en']) for value in sector_mapping.values()}
+
+def prepare_portfolio(df, lang):
+    """
+    Adds the localized display columns, category dtypes and HPR to a freshly loaded portfolio.
+    df is modified in place and returned.
+    """
+    if df.empty:
+        return df
+    # Localized names: each distinct code is looked up once, falling back to the source value
+    df['Member Name'] = map_categorical(df['Member Code'], build_member_lookup(lang))
+    df['Stock Display Name'] = map_categorical(df['ISIN Code'], build_stock_lookup(lang))
+    df['Sector Display Name'] = map_categorical(df['Sector Name'], build_sector_lookup(lang))
+
+    # Remaining low-cardinality text columns as categories so groupby, unique and
+    # equality filtering operate on integer codes instead of Python strings
+    for col in ('Portfolio', 'Broker'):
+        df[col] = df[col].astype('category')
+
+    # HPR is set to 0 where Value At Cost is 0 or missing
+    df['HPR'] = calculate_hpr(df['Value At Cost'], df['Value At Market Price'])
+    return df
+
+@st.cache_resource(max_entries=PORTFOLIO_CACHE_ENTRIES)
+def load_default_portfolio(file_path, modified_time, lang):
+    """
+    Loads and prepares the default portfolio for one language.
+    Uses st.cache_resource so a rerun on the same file and language gets the prepared frame by
+    reference, with no unpickled copy. Callers must treat the returned frame as read-only.
+    The parsed CSV itself comes from the disk-persisted load_default_csv cache.
+    """
+    return prepare_portfolio(load_default_csv(file_path, modified_time), lang)
+
+@st.cache_resource(max_entries=PORTFOLIO_CACHE_ENTRIES)
+def load_uploaded_portfolio(_uploaded_file, file_id, lang):
+    """
+    Loads and prepares an uploaded portfolio for one language, cached in memory on (file_id, lang).
+    The leading underscore tells Streamlit not to hash the upload; file_id identifies it instead.
+    Callers must treat the returned frame as read-only.
+    """
+    # The upload buffer may already have been read for another language
+    _uploaded_file.seek(0)
+    return prepare_portfolio(read_portfolio_csv(_uploaded_file), lang)
+
+@st.cache_data
+def get_filter_options(values):
+    """
+    Builds the sorted option list for a sidebar filter, with 'All' first.
+    Takes a hashable tuple of values (the column's categories) so the list is cached across reruns.
+    """
+    return ['All'] + sorted(set(values))
@@ -0,0 +1,117 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from portfolio_core import (  # noqa: E402
+    MAX_PIE_SLICES,
+    bucket_allocation,
+    calculate_hpr,
+    get_filter_options,
+    map_categorical,
+    read_portfolio_csv,
+)
+
+SAMPLE_CSV = os.path.join(ROOT, 'portfolioinputs.csv')
+VALUE_COLUMNS = ['Value At Cost', 'Value At Market Price']
+
+
+def test_sample_sums_match_float64_baseline():
+    df = read_portfolio_csv(SAMPLE_CSV)
+    baseline = pd.read_csv(SAMPLE_CSV)
+
+    sums = df.groupby('Member Code')[VALUE_COLUMNS].sum().to_numpy(dtype='float64')
+    expected = baseline.groupby('Member Code')[VALUE_COLUMNS].sum().to_numpy(dtype='float64')
+
+    # Amounts are rupees with paise, so sums must agree to within half a paisa
+    assert np.isclose(sums, expected, rtol=0, atol=0.005).all()
+    assert np.isclose(
+        calculate_hpr(sums[:, 0], sums[:, 1]),
+        calculate_hpr(expected[:, 0], expected[:, 1]),
+        rtol=0,
+        atol=0.005,
+    ).all()
+
+
+def test_non_numeric_amount_becomes_nan(tmp_path):
+    lines = open(SAMPLE_CSV, encoding='utf-8-sig').read().splitlines()
+    header = lines[0].split(',')
+    cells = lines[1].split(',')
+    cells[header.index('Value At Market Price')] = '-'
+    lines[1] = ','.join(cells)
+    bad_csv = tmp_path / 'bad.csv'
+    bad_csv.write_text('\n'.join(lines), encoding='utf-8')
+
+    df = read_portfolio_csv(str(bad_csv))
+
+    assert len(df) == len(lines) - 1
+    assert df['Value At Market Price'].isna().sum() == 1
+    assert df['Value At Market Price'].dtype == np.float64
+
+
+def test_map_categorical_all_missing():
+    values = pd.Series([pd.NA, pd.NA], dtype='string[pyarrow]')
+
+    result = map_categorical(values, {'A': 'Alpha'})
+
+    assert result.isna().all()
+    assert len(result) == 2
+
+
+def test_map_categorical_partially_missing():
+    values = pd.Series(['A', pd.NA, 'B', 'C'], dtype='string[pyarrow]')
+
+    result = map_categorical(values, {'A': 'Alpha', 'B': 'Beta'})
+
+    assert result.isna().tolist() == [False, True, False, False]
+    assert result.iloc[[0, 2, 3]].tolist() == ['Alpha', 'Beta', 'C']
+
+
+def test_map_categorical_colliding_names():
+    values = pd.Series(['A', 'B', 'A', 'C'], dtype='string[pyarrow]')
+
+    result = map_categorical(values, {'A': 'Same', 'B': 'Same'})
+
+    assert result.tolist() == ['Same', 'Same', 'Same', 'C']
+    assert sorted(result.cat.categories) == ['C', 'Same']
+
+
+def test_calculate_hpr_guards_zero_and_missing():
+    cost = np.array([100.0, 0.0, np.nan, 100.0, 200.0])
+    market_value = np.array([150.0, 50.0, 10.0, np.nan, 150.0])
+
+    hpr = calculate_hpr(cost, market_value)
+
+    assert hpr.tolist() == [50.0, 0.0, 0.0, 0.0, -25.0]
+    assert np.isfinite(hpr).all()
+
+
+def test_bucket_allocation_groups_small_slices():
+    allocation = pd.Series(
+        np.arange(1, MAX_PIE_SLICES + 6, dtype='float64'),
+        index=[f'G{i}' for i in range(MAX_PIE_SLICES + 5)],
+    )
+
+    labels, values = bucket_allocation(allocation, 'Other')
+
+    assert len(labels) == len(values) == MAX_PIE_SLICES
+    assert labels[-1] == 'Other'
+    assert np.isclose(values.sum(), allocation.sum())
+    assert (np.diff(values[:-1]) <= 0).all()
+
+
+def test_bucket_allocation_keeps_small_charts():
+    allocation = pd.Series([1.0, 3.0, 2.0], index=['A', 'B', 'C'])
+
+    labels, values = bucket_allocation(allocation, 'Other')
+
+    assert labels.tolist() == ['B', 'C', 'A']
+    assert values.tolist() == [3.0, 2.0, 1.0]
+
+
+def test_get_filter_options_all_first_then_sorted():
+    assert get_filter_options(('Zeta', 'Alpha', 'Mid')) == ['All', 'Alpha', 'Mid', 'Zeta']